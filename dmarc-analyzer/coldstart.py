@@ -0,0 +1,224 @@
+"""Cold-start optimized entrypoint for serverless deployments.
+
+Only the standard library is imported up front. Pages that don't depend on the
+request are rendered into snapshot files at build time and served from disk;
+everything else imports `main` (and with it FastHTML) on first use and is
+handed to its app.
+
+    python coldstart.py build      # render snapshots/ from main.py
+    python coldstart.py measure    # report import times of both entrypoints
+"""
+
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).parent
+SNAPSHOT_DIR = APP_DIR / "snapshots"
+MANIFEST = SNAPSHOT_DIR / "manifest.json"
+
+# Routes whose response is the same for every request
+STATIC_ROUTES = {
+    "/": "index.html",
+}
+
+_main_app = None
+_manifest = None
+_snapshots = None
+
+
+def source_hash():
+    """Hash of main.py, used to detect snapshots built from older code"""
+    return hashlib.sha256((APP_DIR / "main.py").read_bytes()).hexdigest()
+
+
+def load_manifest():
+    """Return the snapshot manifest, or {} if missing or out of date"""
+    global _manifest
+    if _manifest is None:
+        try:
+            _manifest = json.loads(MANIFEST.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            _manifest = {}
+        if _manifest and _manifest.get("source") != source_hash():
+            print(
+                "coldstart: snapshots are out of date, ignoring them", file=sys.stderr
+            )
+            _manifest = {}
+    return _manifest
+
+
+def read_snapshot(filename):
+    """Contents of a current snapshot file, or None"""
+    manifest = load_manifest()
+    files = [page["file"] for page in manifest.get("pages", {}).values()]
+    if filename not in files:
+        return None
+    try:
+        return (SNAPSHOT_DIR / filename).read_bytes()
+    except OSError:
+        return None
+
+
+def load_snapshots():
+    """Load the static route snapshots into ready-to-send responses"""
+    snapshots = {}
+    for route, page in load_manifest().get("pages", {}).items():
+        body = read_snapshot(page["file"])
+        if body is None:
+            continue
+        snapshots[route] = (
+            [
+                (b"content-type", page["content_type"].encode()),
+                (b"content-length", str(len(body)).encode()),
+            ],
+            body,
+        )
+    return snapshots
+
+
+def load_main():
+    """Import main.py, keep its ASGI app and return the import time in ms"""
+    global _main_app
+    started = time.perf_counter()
+    import main
+
+    _main_app = main.app
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"coldstart: imported main in {elapsed:.1f}ms", file=sys.stderr)
+    return elapsed
+
+
+async def lifespan(receive, send):
+    # Answered here so that startup doesn't force the import of main
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI app serving snapshots and delegating everything else to main"""
+    global _snapshots
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    if _snapshots is None:
+        _snapshots = load_snapshots()
+
+    snapshot = _snapshots.get(scope.get("path"))
+    if snapshot and scope.get("method") in ("GET", "HEAD"):
+        headers, body = snapshot
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send(
+            {
+                "type": "http.response.body",
+                "body": b"" if scope["method"] == "HEAD" else body,
+            }
+        )
+        return
+
+    if _main_app is not None:
+        return await _main_app(scope, receive, send)
+
+    import_ms = load_main()
+
+    async def send_with_timing(message):
+        if message["type"] == "http.response.start":
+            message = {
+                **message,
+                "headers": [
+                    *message.get("headers", []),
+                    (b"server-timing", f"import;dur={import_ms:.1f}".encode()),
+                ],
+            }
+        await send(message)
+
+    await _main_app(scope, receive, send_with_timing)
+
+
+def import_time(module):
+    """Import `module` in a fresh interpreter and return (total ms, top imports)"""
+    import subprocess
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Lines look like "import time: self [us] | cumulative | <indent>package",
+    # with children listed before the module that imported them
+    children = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        cumulative = int(parts[1]) / 1000
+        if depth == 1:
+            children.append((cumulative, name.strip()))
+        elif depth == 0:
+            if name.strip() == module:
+                return cumulative, sorted(children, reverse=True)[:5]
+            children = []
+    return 0.0, []
+
+
+def measure():
+    """Report import times of coldstart and main"""
+    report = {}
+    for module in ("coldstart", "main"):
+        total, top = import_time(module)
+        report[module] = {"import_ms": round(total, 1), "top": top}
+        print(f"{module:10} {total:8.1f}ms")
+        for ms, name in top:
+            print(f"    {ms:8.1f}ms  {name}")
+    return report
+
+
+def build():
+    """Render the static routes of main into snapshot files"""
+    from starlette.testclient import TestClient
+    import main
+
+    # The canonical link would point at the test client's host
+    main.app.canonical = False
+    SNAPSHOT_DIR.mkdir(exist_ok=True)
+    pages = {}
+    with TestClient(main.app) as client:
+        for route, filename in STATIC_ROUTES.items():
+            response = client.get(route)
+            response.raise_for_status()
+            (SNAPSHOT_DIR / filename).write_bytes(response.content)
+            pages[route] = {
+                "file": filename,
+                "content_type": response.headers["content-type"],
+            }
+            print(f"snapshot {route} -> {SNAPSHOT_DIR.name}/{filename}")
+
+    MANIFEST.write_text(
+        json.dumps(
+            {
+                "source": source_hash(),
+                "pages": pages,
+                "imports": measure(),
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+
+
+if __name__ == "__main__":
+    commands = {"build": build, "measure": measure}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        sys.exit(f"usage: python coldstart.py {{{','.join(commands)}}}")
+    commands[sys.argv[1]]()
@@ -1,28 +1,33 @@
 from fasthtml.common import *
 import xml.etree.ElementTree as ET
-from io import BytesIO
 import datetime
+import json
+import os
+import time
+import zipfile
+import zlib
+
+# htmx doesn't swap error responses by default, but an upload rejected as too
+# large should show its error box like any other parse error
+HTMX_CONFIG = {
+    "responseHandling": [
+        {"code": "204", "swap": False},
+        {"code": "[23]..", "swap": True},
+        {"code": "413", "swap": True, "error": False},
+        {"code": "[45]..", "swap": False, "error": True},
+    ]
+}
 
-app, rt = fast_app()
-
-
-def parse_dmarc_xml(uploaded_file):
-    """Parse DMARC XML file and return structured data"""
-    try:
+app, rt = fast_app(hdrs=[Meta(name="htmx-config", content=json.dumps(HTMX_CONFIG))])
 
-        content = uploaded_file.file.read()
-        tree = ET.parse(BytesIO(content))
-        root = tree.getroot()
-    except Exception as e:
-        return None, [f"Fehler beim Parsen der XML: {e}"], [], [], [], {}
 
-    meta = {}
-    meta["org"] = root.findtext("./report_metadata/org_name", default="Unbekannt")
-    meta["domain"] = root.findtext("./policy_published/domain", default="Unbekannt")
-    meta["email"] = root.findtext("./report_metadata/email", default="")
+def read_report_metadata(report_metadata, meta):
+    """Fill meta with organisation, contact and date range of a report"""
+    meta["org"] = report_metadata.findtext("org_name", default="Unbekannt")
+    meta["email"] = report_metadata.findtext("email", default="")
 
-    begin = root.findtext("./report_metadata/date_range/begin")
-    end = root.findtext("./report_metadata/date_range/end")
+    begin = report_metadata.findtext("./date_range/begin")
+    end = report_metadata.findtext("./date_range/end")
     if begin and end:
         try:
             meta["begin"] = datetime.datetime.fromtimestamp(int(begin))
@@ -32,87 +37,479 @@ def parse_dmarc_xml(uploaded_file):
     else:
         meta["begin"] = meta["end"] = None
 
-    policy = root.find("./policy_published")
-    if policy is None:
-        return None, ["<policy_published> Element fehlt in der XML"], [], [], [], meta
 
+def read_policy_published(policy, meta):
+    """Fill meta with the published DMARC policy"""
+    meta["domain"] = policy.findtext("domain", default="Unbekannt")
     meta["dmarc_policy"] = policy.findtext("p", default="none")
     meta["sp_policy"] = policy.findtext("sp", default="none")
     meta["pct"] = policy.findtext("pct", default="100")
     meta["adkim"] = policy.findtext("adkim", default="r")
     meta["aspf"] = policy.findtext("aspf", default="r")
 
-    records = []
-    good_records = []
-    warning_records = []
-    error_records = []
 
-    for rec in root.findall("./record"):
-        ip = rec.findtext("./row/source_ip", default="Unbekannt")
-        count = rec.findtext("./row/count", default="1")
-        disp = rec.findtext("./row/policy_evaluated/disposition", default="none")
-        spf = rec.findtext("./row/policy_evaluated/spf", default="fail")
-        dkim = rec.findtext("./row/policy_evaluated/dkim", default="fail")
+def read_record(rec):
+    """Turn a <record> element into a record entry"""
+    count = rec.findtext("./row/count", default="1")
+    try:
+        count = int(count)
+    except (ValueError, TypeError):
+        count = 1
+
+    return {
+        "ip": rec.findtext("./row/source_ip", default="Unbekannt"),
+        "count": count,
+        "disposition": rec.findtext(
+            "./row/policy_evaluated/disposition", default="none"
+        ),
+        "spf": rec.findtext("./row/policy_evaluated/spf", default="fail"),
+        "dkim": rec.findtext("./row/policy_evaluated/dkim", default="fail"),
+        "header_from": rec.findtext("./identifiers/header_from", default=""),
+        "dkim_results": [
+            (auth.findtext("domain", default=""), auth.findtext("result", default=""))
+            for auth in rec.findall("./auth_results/dkim")
+        ],
+        "spf_results": [
+            (auth.findtext("domain", default=""), auth.findtext("result", default=""))
+            for auth in rec.findall("./auth_results/spf")
+        ],
+    }
+
+
+def classify_record(entry):
+    """Return "good", "warning" or "error" for a record entry"""
+    disp, spf, dkim = entry["disposition"], entry["spf"], entry["dkim"]
+    if disp == "none" and spf == "pass" and dkim == "pass":
+        return "good"
+    if disp == "none" and (spf == "pass" or dkim == "pass"):
+        return "warning"
+    return "error"
+
+
+def env_limit(name, default, cast=int):
+    """A parse limit from the environment, 0 disables it"""
+    return cast(os.environ.get(name, default))
+
+
+# Caps for parsing uploaded reports, 0 disables a single cap
+PARSE_LIMITS = {
+    "max_bytes": env_limit("DMARC_MAX_BYTES", 50 * 2**20),
+    "max_xml_bytes": env_limit("DMARC_MAX_XML_BYTES", 200 * 2**20),
+    "max_records": env_limit("DMARC_MAX_RECORDS", 500_000),
+    # Records held back because <policy_published> hasn't been read yet
+    "max_early_records": env_limit("DMARC_MAX_EARLY_RECORDS", 1_000),
+    "max_depth": env_limit("DMARC_MAX_DEPTH", 16),
+    "max_elements": env_limit("DMARC_MAX_ELEMENTS", 1_000),
+    # Bytes without a single tag, i.e. the longest text, comment or attribute
+    "max_text_bytes": env_limit("DMARC_MAX_TEXT_BYTES", 2**20),
+    "max_seconds": env_limit("DMARC_MAX_PARSE_SECONDS", 30, float),
+}
+
+# /analyze renders the whole page at once, larger reports go to /analyze/stream
+ANALYZE_LIMITS = {
+    **PARSE_LIMITS,
+    "max_records": env_limit("DMARC_ANALYZE_MAX_RECORDS", 20_000),
+}
+
+# /analyze/stream renders every record, so it gets its own record cap and a
+# deadline for the whole response, rendering and sending included
+STREAM_LIMITS = {
+    **PARSE_LIMITS,
+    "max_records": env_limit("DMARC_STREAM_MAX_RECORDS", 100_000),
+}
+STREAM_MAX_SECONDS = env_limit("DMARC_STREAM_MAX_SECONDS", 60, float)
+
+# Rows rendered into the records table and error details of one page
+MAX_TABLE_ROWS = 1_000
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Multipart boundaries and part headers on top of the uploaded file
+MULTIPART_OVERHEAD = 64 * 1024
 
-        header_from = rec.findtext("./identifiers/header_from", default="")
+
+def file_too_large_error(max_bytes):
+    return f"Datei zu groß (maximal {max_bytes // 2**20} MB)"
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadLimit:
+    """ASGI middleware rejecting request bodies above max_bytes while they arrive
+
+    Starlette spools a multipart body to disk before the handler runs, so
+    without this a huge upload would be received completely before
+    read_report gets to reject it.
+    """
+
+    def __init__(self, app, max_bytes):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.max_bytes:
+            return await self.app(scope, receive, send)
+
+        limit = self.max_bytes + MULTIPART_OVERHEAD
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            return await self.reject(send)
+
+        received = 0
+        started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise UploadTooLarge()
+            return message
+
+        async def tracking_send(message):
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
 
         try:
-            count = int(count)
-        except (ValueError, TypeError):
-            count = 1
-
-        entry = {
-            "ip": ip,
-            "count": count,
-            "disposition": disp,
-            "spf": spf,
-            "dkim": dkim,
-            "header_from": header_from,
-        }
-
-        if disp == "none" and spf == "pass" and dkim == "pass":
-            good_records.append(entry)
-        elif disp == "none" and (spf == "pass" or dkim == "pass"):
-            warning_records.append(entry)
+            await self.app(scope, limited_receive, tracking_send)
+        except UploadTooLarge:
+            if started:
+                raise
+            await self.reject(send)
+
+    async def reject(self, send):
+        body = to_xml(
+            create_parse_errors([file_too_large_error(self.max_bytes)])
+        ).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [
+                    (b"content-type", b"text/html; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"connection", b"close"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+app.add_middleware(UploadLimit, max_bytes=PARSE_LIMITS["max_bytes"])
+
+
+def read_chunks(fileobj, max_bytes=0, head=b""):
+    """Yield the raw bytes of fileobj in chunks, at most max_bytes in total"""
+    total = 0
+    chunk = head
+    while chunk:
+        total += len(chunk)
+        if max_bytes and total > max_bytes:
+            raise ValueError(file_too_large_error(max_bytes))
+        yield chunk
+        chunk = fileobj.read(READ_CHUNK_SIZE)
+
+
+def gunzip_chunks(chunks):
+    """Decompress gzip chunks without inflating more than one chunk at a time"""
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        while chunk:
+            try:
+                data = decompressor.decompress(chunk, READ_CHUNK_SIZE)
+            except zlib.error as e:
+                raise ValueError(f"Ungültige gzip-Datei: {e}")
+            if data:
+                yield data
+            if decompressor.eof:
+                # Concatenated gzip members
+                chunk = decompressor.unused_data
+                decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            else:
+                chunk = decompressor.unconsumed_tail
+    data = decompressor.flush()
+    if data:
+        yield data
+
+
+def unzip_chunks(fileobj, max_bytes=0):
+    """Yield the first XML file of a zip archive in chunks"""
+    size = fileobj.seek(0, 2)
+    if max_bytes and size > max_bytes:
+        raise ValueError(file_too_large_error(max_bytes))
+    fileobj.seek(0)
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except (zipfile.BadZipFile, EOFError) as e:
+        raise ValueError(f"Ungültiges ZIP-Archiv: {e}")
+    members = [
+        info for info in archive.infolist() if info.filename.lower().endswith(".xml")
+    ]
+    if not members:
+        raise ValueError("ZIP-Archiv enthält keine XML-Datei")
+    if members[0].flag_bits & 0x1:
+        raise ValueError(
+            "Ungültiges ZIP-Archiv: verschlüsselte Dateien werden nicht unterstützt"
+        )
+    try:
+        with archive.open(members[0]) as member:
+            while chunk := member.read(READ_CHUNK_SIZE):
+                yield chunk
+    except (
+        zipfile.BadZipFile,
+        zlib.error,
+        NotImplementedError,
+        RuntimeError,
+        EOFError,
+    ) as e:
+        raise ValueError(f"Ungültiges ZIP-Archiv: {e}")
+
+
+def read_report(fileobj, limits=PARSE_LIMITS):
+    """Yield the XML of a report in chunks, decompressing .gz and .zip uploads
+
+    Raises ValueError once the upload or its decompressed XML exceeds the limits.
+    """
+    limits = limits or {}
+    max_bytes = limits.get("max_bytes")
+    max_xml_bytes = limits.get("max_xml_bytes")
+
+    head = fileobj.read(4)
+    if head.startswith(b"\x1f\x8b"):
+        chunks = gunzip_chunks(read_chunks(fileobj, max_bytes, head))
+    elif head.startswith(b"PK\x03\x04"):
+        chunks = unzip_chunks(fileobj, max_bytes)
+    else:
+        chunks = read_chunks(fileobj, max_bytes, head)
+
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+        if max_xml_bytes and total > max_xml_bytes:
+            raise ValueError(
+                f"Entpackter Bericht zu groß (maximal {max_xml_bytes // 2**20} MB)"
+            )
+        yield chunk
+
+
+class RecordLimitError(ValueError):
+    """Raised when a report has more records than the limits allow"""
+
+
+class ReportBuilder(ET.TreeBuilder):
+    """Tree builder that enforces the limits and detaches finished sections
+
+    Every element directly below the root (report_metadata, policy_published,
+    record) is removed from the tree once it is complete and collected in
+    `completed`, so memory stays bounded by the size of a single section.
+    """
+
+    def __init__(self, limits):
+        super().__init__()
+        self.max_depth = limits.get("max_depth")
+        self.max_elements = limits.get("max_elements")
+        self.max_records = limits.get("max_records")
+        self.stack = []
+        self.tags = 0
+        self.elements = 0
+        self.records = 0
+        self.completed = []
+
+    def start(self, tag, attrs):
+        if self.max_depth and len(self.stack) >= self.max_depth:
+            raise ValueError(
+                f"XML zu tief verschachtelt (maximal {self.max_depth} Ebenen)"
+            )
+        self.elements += 1
+        if self.max_elements and self.elements > self.max_elements:
+            raise ValueError(
+                f"Abschnitt im Bericht zu groß (maximal {self.max_elements} Elemente)"
+            )
+        elem = super().start(tag, attrs)
+        self.stack.append(elem)
+        self.tags += 1
+        return elem
+
+    def end(self, tag):
+        elem = super().end(tag)
+        self.stack.pop()
+        self.tags += 1
+        if len(self.stack) == 1:
+            if elem.tag == "record":
+                self.records += 1
+                if self.max_records and self.records > self.max_records:
+                    raise RecordLimitError(
+                        f"Zu viele Einträge im Bericht (maximal {self.max_records})"
+                    )
+            self.stack[0].remove(elem)
+            self.completed.append(elem)
+            self.elements = 0
+        return elem
+
+    def doctype(self, name, pubid, system):
+        # Also catches DTDs the byte scan misses, e.g. in UTF-16 documents
+        raise ValueError("DTD- und Entity-Deklarationen sind nicht erlaubt")
+
+
+def iter_dmarc_xml(fileobj, limits=PARSE_LIMITS):
+    """Parse DMARC XML incrementally, yielding ("meta", meta) and then ("record", entry)
+
+    meta is yielded as soon as <policy_published> has been read, records as
+    they are parsed; records that precede the policy are held back until it
+    has been read, at most max_early_records of them. The report may be gzip or zip compressed. DTDs and entity
+    declarations are always rejected; with limits (see PARSE_LIMITS) parsing
+    stops as soon as a cap is exceeded. Raises ValueError in both cases and if
+    the report has no policy, ET.ParseError for malformed XML.
+    """
+    limits = limits or {}
+    max_seconds = limits.get("max_seconds")
+    max_text_bytes = limits.get("max_text_bytes")
+    max_early_records = limits.get("max_early_records")
+    meta = {"org": "Unbekannt", "domain": "Unbekannt", "email": ""}
+    meta["begin"] = meta["end"] = None
+    have_policy = False
+    pending = []
+
+    builder = ReportBuilder(limits)
+    parser = ET.XMLParser(target=builder)
+    chunks = read_report(fileobj, limits)
+    tail = b""
+    tags = untagged = 0
+    elapsed = 0.0
+
+    while True:
+        # Only time spent parsing counts, not time the consumer holds us up
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        if chunk is None:
+            parser.close()
         else:
-            error_records.append(entry)
+            scan = tail + chunk
+            if b"<!DOCTYPE" in scan or b"<!ENTITY" in scan:
+                raise ValueError("DTD- und Entity-Deklarationen sind nicht erlaubt")
+            tail = chunk[-8:]
+            parser.feed(chunk)
+        elapsed += time.perf_counter() - started
+        if max_seconds and elapsed > max_seconds:
+            raise ValueError(f"Zeitlimit beim Parsen überschritten ({max_seconds:g} s)")
+
+        # expat rescans an unfinished token on every feed, so huge text or
+        # comments would make parsing quadratic
+        if builder.tags != tags:
+            tags, untagged = builder.tags, 0
+        elif chunk:
+            untagged += len(chunk)
+            if max_text_bytes and untagged > max_text_bytes:
+                raise ValueError(
+                    f"Text oder Kommentar im Bericht zu lang "
+                    f"(maximal {max_text_bytes // 1024} KB)"
+                )
 
-        records.append(entry)
+        completed, builder.completed = builder.completed, []
+        for elem in completed:
+            if elem.tag == "report_metadata":
+                read_report_metadata(elem, meta)
+            elif elem.tag == "policy_published":
+                read_policy_published(elem, meta)
+                have_policy = True
+                yield "meta", meta
+                for entry in pending:
+                    yield "record", entry
+                pending = []
+            elif elem.tag == "record":
+                if have_policy:
+                    yield "record", read_record(elem)
+                elif max_early_records and len(pending) >= max_early_records:
+                    raise ValueError(
+                        f"Zu viele Einträge vor <policy_published> "
+                        f"(maximal {max_early_records})"
+                    )
+                else:
+                    pending.append(read_record(elem))
+
+        if chunk is None:
+            break
+
+    if not have_policy:
+        raise ValueError("<policy_published> Element fehlt in der XML")
+
+
+def parse_dmarc_xml(uploaded_file, limits=PARSE_LIMITS):
+    """Parse DMARC XML file and return structured data
+
+    A report with more records than limits allow is rejected with a hint to
+    the streaming upload.
+    """
+    meta = {}
+    records = []
+    classified = {"good": [], "warning": [], "error": []}
 
-    return records, [], good_records, warning_records, error_records, meta
+    try:
+        for kind, item in iter_dmarc_xml(uploaded_file.file, limits):
+            if kind == "meta":
+                meta = item
+                continue
+            classified[classify_record(item)].append(item)
+            records.append(item)
+    except ET.ParseError as e:
+        return None, [f"Fehler beim Parsen der XML: {e}"], [], [], [], {}
+    except RecordLimitError as e:
+        hint = "Für große Berichte nutzen Sie den Streaming-Upload auf der Startseite."
+        return None, [str(e), hint], [], [], [], meta
+    except ValueError as e:
+        return None, [str(e)], [], [], [], meta
+
+    return (
+        records,
+        [],
+        classified["good"],
+        classified["warning"],
+        classified["error"],
+        meta,
+    )
 
 
 def create_summary_boxes(good_records, warning_records, error_records, meta):
     """Create summary boxes with color-coded results"""
-    boxes = []
+    totals = {
+        "good": [len(good_records), sum(r["count"] for r in good_records)],
+        "warning": [len(warning_records), sum(r["count"] for r in warning_records)],
+        "error": [len(error_records), sum(r["count"] for r in error_records)],
+    }
+    return create_summary_boxes_from_totals(totals, meta)
 
-    total_messages = sum(
-        r["count"] for r in good_records + warning_records + error_records
-    )
+
+def create_summary_boxes_from_totals(totals, meta):
+    """Create summary boxes from [records, messages] totals per classification"""
+    boxes = []
+    good_records, total_good = totals["good"]
+    warning_records, total_warning = totals["warning"]
+    error_records, total_error = totals["error"]
 
     if good_records:
-        total_good = sum(r["count"] for r in good_records)
         boxes.append(
             Div(
-                f"✅ {len(good_records)} IP-Adressen ({total_good} Nachrichten) - Vollständig authentifiziert",
+                f"✅ {good_records} IP-Adressen ({total_good} Nachrichten) - Vollständig authentifiziert",
                 style="padding: 10px; margin: 5px 0; background: #d4edda; color: #155724; border: 1px solid #c3e6cb; border-radius: 4px; font-weight: bold;",
             )
         )
 
     if warning_records:
-        total_warning = sum(r["count"] for r in warning_records)
         boxes.append(
             Div(
-                f"⚠️ {len(warning_records)} IP-Adressen ({total_warning} Nachrichten) - Teilweise authentifiziert",
+                f"⚠️ {warning_records} IP-Adressen ({total_warning} Nachrichten) - Teilweise authentifiziert",
                 style="padding: 10px; margin: 5px 0; background: #fff3cd; color: #856404; border: 1px solid #ffeaa7; border-radius: 4px; font-weight: bold;",
             )
         )
 
     if error_records:
-        total_error = sum(r["count"] for r in error_records)
         boxes.append(
             Div(
-                f"❌ {len(error_records)} IP-Adressen ({total_error} Nachrichten) - Authentifizierung fehlgeschlagen",
+                f"❌ {error_records} IP-Adressen ({total_error} Nachrichten) - Authentifizierung fehlgeschlagen",
                 style="padding: 10px; margin: 5px 0; background: #f8d7da; color: #721c24; border: 1px solid #f5c6cb; border-radius: 4px; font-weight: bold;",
             )
         )
@@ -136,14 +533,20 @@ def create_summary_boxes(good_records, warning_records, error_records, meta):
     return boxes
 
 
-def create_records_table(records):
-    """Create a table of all records with color coding"""
-    if not records:
-        return P(
-            "Keine Einträge gefunden.", style="color: #6c757d; font-style: italic;"
-        )
+RECORDS_TABLE_STYLE = (
+    "width: 100%; border-collapse: collapse; border: 1px solid #dee2e6; margin: 10px 0;"
+)
+
+RECORD_ROW_STYLES = {
+    "good": "background-color: #d4edda; color: #155724;",
+    "warning": "background-color: #fff3cd; color: #856404;",
+    "error": "background-color: #f8d7da; color: #721c24;",
+}
+
 
-    header = Tr(
+def create_records_table_header():
+    """Create the header row of the records table"""
+    return Tr(
         Th("IP-Adresse", style="padding: 8px; text-align: left;"),
         Th("SPF", style="padding: 8px; text-align: center;"),
         Th("DKIM", style="padding: 8px; text-align: center;"),
@@ -153,44 +556,119 @@ def create_records_table(records):
         style="background-color: #f8f9fa;",
     )
 
-    rows = []
-    for r in records:
 
-        if r["disposition"] == "none" and r["spf"] == "pass" and r["dkim"] == "pass":
-            row_style = "background-color: #d4edda; color: #155724;"
-        elif r["disposition"] == "none" and (r["spf"] == "pass" or r["dkim"] == "pass"):
-            row_style = "background-color: #fff3cd; color: #856404;"
-        else:
-            row_style = "background-color: #f8d7da; color: #721c24;"
-
-        rows.append(
-            Tr(
-                Td(r["ip"], style="padding: 8px; font-family: monospace;"),
-                Td(
-                    r["spf"],
-                    style="padding: 8px; text-align: center; font-weight: bold;",
-                ),
-                Td(
-                    r["dkim"],
-                    style="padding: 8px; text-align: center; font-weight: bold;",
-                ),
-                Td(r["disposition"], style="padding: 8px; text-align: center;"),
-                Td(
-                    str(r["count"]),
-                    style="padding: 8px; text-align: right; font-weight: bold;",
-                ),
-                Td(
-                    r["header_from"] or "-",
-                    style="padding: 8px; font-family: monospace;",
-                ),
-                style=row_style,
+def create_record_row(r):
+    """Create a color coded table row for a record"""
+    return Tr(
+        Td(r["ip"], style="padding: 8px; font-family: monospace;"),
+        Td(
+            r["spf"],
+            style="padding: 8px; text-align: center; font-weight: bold;",
+        ),
+        Td(
+            r["dkim"],
+            style="padding: 8px; text-align: center; font-weight: bold;",
+        ),
+        Td(r["disposition"], style="padding: 8px; text-align: center;"),
+        Td(
+            str(r["count"]),
+            style="padding: 8px; text-align: right; font-weight: bold;",
+        ),
+        Td(
+            r["header_from"] or "-",
+            style="padding: 8px; font-family: monospace;",
+        ),
+        style=RECORD_ROW_STYLES[classify_record(r)],
+    )
+
+
+def create_records_table(records):
+    """Create a table of the records with color coding, at most MAX_TABLE_ROWS"""
+    if not records:
+        return P(
+            "Keine Einträge gefunden.", style="color: #6c757d; font-style: italic;"
+        )
+
+    table = Table(
+        Thead(create_records_table_header()),
+        Tbody(*[create_record_row(r) for r in records[:MAX_TABLE_ROWS]]),
+        style=RECORDS_TABLE_STYLE,
+    )
+    if len(records) <= MAX_TABLE_ROWS:
+        return table
+    return Div(
+        table,
+        P(
+            f"Es werden die ersten {MAX_TABLE_ROWS} von {len(records)} Einträgen angezeigt. "
+            "Alle Einträge zeigt der Streaming-Upload auf der Startseite.",
+            style="color: #6c757d; font-style: italic;",
+        ),
+    )
+
+
+def create_report_header(meta):
+    """Create the report header with domain, organisation and date range"""
+    return Div(
+        H2(
+            f"📊 DMARC Report für {meta.get('domain', 'Unbekannt')}",
+            style="color: #343a40; margin-bottom: 10px;",
+        ),
+        P(
+            f"Organisation: {meta.get('org', 'Unbekannt')}",
+            style="margin: 5px 0; color: #6c757d;",
+        ),
+        (
+            P(
+                f"Berichtszeitraum: {meta['begin'].strftime('%d.%m.%Y %H:%M') if meta.get('begin') else 'Unbekannt'} - {meta['end'].strftime('%d.%m.%Y %H:%M') if meta.get('end') else 'Unbekannt'}",
+                style="margin: 5px 0; color: #6c757d;",
             )
+            if meta.get("begin") and meta.get("end")
+            else None
+        ),
+        style="margin-bottom: 30px; padding: 20px; background: #f8f9fa; border-radius: 4px;",
+    )
+
+
+def create_error_details(error_records, total=None):
+    """Create a collapsible plain text list of failed records
+
+    Only the first MAX_TABLE_ROWS are listed, total is the number of failed
+    records if error_records has already been cut off.
+    """
+    total = total or len(error_records)
+    error_details = []
+    for e in error_records[:MAX_TABLE_ROWS]:
+        error_details.append(
+            f"IP: {e['ip']} | Anzahl: {e['count']} | SPF: {e['spf']} | DKIM: {e['dkim']} | Disposition: {e['disposition']}"
         )
 
-    return Table(
-        Thead(header),
-        Tbody(*rows),
-        style="width: 100%; border-collapse: collapse; border: 1px solid #dee2e6; margin: 10px 0;",
+    return Details(
+        Summary(
+            "🔍 Fehlerdetails anzeigen",
+            style="cursor: pointer; font-weight: bold; margin: 20px 0 10px 0;",
+        ),
+        Pre(
+            "\n".join(error_details),
+            style="background: #f8f9fa; padding: 15px; border-radius: 4px; overflow-x: auto; font-family: monospace; font-size: 12px;",
+        ),
+        (
+            P(
+                f"Es werden die ersten {MAX_TABLE_ROWS} von {total} fehlgeschlagenen Einträgen angezeigt.",
+                style="color: #6c757d; font-style: italic;",
+            )
+            if total > MAX_TABLE_ROWS
+            else ""
+        ),
+    )
+
+
+def create_parse_errors(parse_errors):
+    """Create the error box shown when a report can't be parsed"""
+    return Div(
+        H3("❌ Fehler beim Parsen der XML-Datei", style="color: #dc3545;"),
+        Ul(*[Li(error, style="color: #dc3545;") for error in parse_errors]),
+        id="result",
+        style="padding: 20px; background: #f8d7da; border-radius: 4px; margin: 20px 0;",
     )
 
 
@@ -220,13 +698,13 @@ def index():
             Form(
                 Div(
                     Label(
-                        "DMARC XML-Datei auswählen:",
+                        "DMARC-Bericht auswählen (.xml, .gz oder .zip):",
                         style="font-weight: bold;",
                     ),
                     Input(
                         type="file",
                         name="dmarcxml",
-                        accept=".xml",
+                        accept=".xml,.gz,.zip",
                         required=True,
                         style="margin-bottom: 15px; border: 1px solid #ced4da; border-radius: 4px; width: 100%;",
                     ),
@@ -244,6 +722,30 @@ def index():
                 hx_swap="innerHTML",
                 hx_indicator="#loading",
             ),
+            Details(
+                Summary(
+                    "📦 Große Berichte: Ergebnisse schon während der Analyse anzeigen"
+                ),
+                Form(
+                    Input(
+                        type="file",
+                        name="dmarcxml",
+                        accept=".xml,.gz,.zip",
+                        required=True,
+                        style="margin-bottom: 15px; border: 1px solid #ced4da; border-radius: 4px; width: 100%;",
+                    ),
+                    Button(
+                        "Bericht streamen",
+                        type="submit",
+                        style="background-color: #007bff; color: white; padding: 10px 20px; border: none; border-radius: 4px; font-size: 16px;",
+                    ),
+                    method="post",
+                    action="/analyze/stream",
+                    enctype="multipart/form-data",
+                    style="max-width: 500px;",
+                ),
+                style="margin-top: 20px;",
+            ),
             Div(
                 "🔄 Analysiere...",
                 id="loading",
@@ -256,8 +758,9 @@ def index():
 
 
 @rt("/analyze", methods=["POST"])
-async def analyze_dmarc(dmarcxml: UploadFile):
+def analyze_dmarc(dmarcxml: UploadFile):
     """Analyze uploaded DMARC XML file"""
+    # Sync on purpose: parsing runs in the threadpool, not on the event loop
     if not dmarcxml.filename:
         return Div(
             "❌ Keine Datei ausgewählt",
@@ -266,40 +769,15 @@ async def analyze_dmarc(dmarcxml: UploadFile):
         )
 
     records, parse_errors, good_records, warning_records, error_records, meta = (
-        parse_dmarc_xml(dmarcxml)
+        parse_dmarc_xml(dmarcxml, ANALYZE_LIMITS)
     )
 
     if parse_errors:
-        return Div(
-            H3("❌ Fehler beim Parsen der XML-Datei", style="color: #dc3545;"),
-            Ul(*[Li(error, style="color: #dc3545;") for error in parse_errors]),
-            id="result",
-            style="padding: 20px; background: #f8d7da; border-radius: 4px; margin: 20px 0;",
-        )
+        return create_parse_errors(parse_errors)
 
     content = []
 
-    content.append(
-        Div(
-            H2(
-                f"📊 DMARC Report für {meta.get('domain', 'Unbekannt')}",
-                style="color: #343a40; margin-bottom: 10px;",
-            ),
-            P(
-                f"Organisation: {meta.get('org', 'Unbekannt')}",
-                style="margin: 5px 0; color: #6c757d;",
-            ),
-            (
-                P(
-                    f"Berichtszeitraum: {meta['begin'].strftime('%d.%m.%Y %H:%M') if meta.get('begin') else 'Unbekannt'} - {meta['end'].strftime('%d.%m.%Y %H:%M') if meta.get('end') else 'Unbekannt'}",
-                    style="margin: 5px 0; color: #6c757d;",
-                )
-                if meta.get("begin") and meta.get("end")
-                else None
-            ),
-            style="margin-bottom: 30px; padding: 20px; background: #f8f9fa; border-radius: 4px;",
-        )
-    )
+    content.append(create_report_header(meta))
 
     content.append(H3("📈 Zusammenfassung", style="margin: 20px 0 10px 0;"))
     content.extend(
@@ -319,26 +797,123 @@ async def analyze_dmarc(dmarcxml: UploadFile):
         content.append(create_records_table(records))
 
     if error_records:
-        error_details = []
-        for e in error_records:
-            error_details.append(
-                f"IP: {e['ip']} | Anzahl: {e['count']} | SPF: {e['spf']} | DKIM: {e['dkim']} | Disposition: {e['disposition']}"
-            )
+        content.append(create_error_details(error_records))
 
-        content.append(
-            Details(
-                Summary(
-                    "🔍 Fehlerdetails anzeigen",
-                    style="cursor: pointer; font-weight: bold; margin: 20px 0 10px 0;",
-                ),
-                Pre(
-                    "\n".join(error_details),
-                    style="background: #f8f9fa; padding: 15px; border-radius: 4px; overflow-x: auto; font-family: monospace; font-size: 12px;",
-                ),
-            )
+    return Div(*content, id="result", style="animation: fadeIn 0.5s ease-in;")
+
+
+STREAM_BATCH_SIZE = 200
+
+
+def records_table_start():
+    """Opening markup of the records table, rows are streamed into its body"""
+    return (
+        to_xml(H3("📋 Detaillierte Ergebnisse", style="margin: 30px 0 10px 0;"))
+        + f'<table style="{RECORDS_TABLE_STYLE}">'
+        + to_xml(Thead(create_records_table_header()))
+        + "<tbody>"
+    )
+
+
+def summary_update_script(totals, meta):
+    """Script tag replacing the running summary with the current totals"""
+    boxes = "".join(
+        to_xml(box) for box in create_summary_boxes_from_totals(totals, meta)
+    )
+    html = json.dumps(boxes).replace("</", "<\\/")
+    return f"<script>document.getElementById('summary').innerHTML = {html};</script>"
+
+
+def stream_dmarc_report(
+    fileobj,
+    batch_size=STREAM_BATCH_SIZE,
+    limits=STREAM_LIMITS,
+    max_seconds=STREAM_MAX_SECONDS,
+):
+    """Yield the analysis page as HTML chunks while the report is being parsed
+
+    Stops with an error once the response has taken longer than max_seconds.
+    """
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    yield (
+        "<!doctype html><html><head><meta charset='utf-8'>"
+        + to_xml(Title("DMARC XML Report Analyzer"))
+        + "".join(to_xml(h) for h in picolink)
+        + "</head><body><main class='container' style='max-width:1200px;margin:auto;padding:20px;'>"
+    )
+
+    totals = {"good": [0, 0], "warning": [0, 0], "error": [0, 0]}
+    error_records = []
+    rows = []
+    meta = {}
+    table_open = False
+
+    try:
+        for kind, item in iter_dmarc_xml(fileobj, limits):
+            if deadline and time.monotonic() > deadline:
+                raise ValueError(
+                    f"Zeitlimit für die Analyse überschritten ({max_seconds:g} s)"
+                )
+            if kind == "meta":
+                meta = item
+                yield to_xml(create_report_header(meta))
+                yield to_xml(
+                    H3("📈 Zusammenfassung", style="margin: 20px 0 10px 0;")
+                ) + to_xml(Div(id="summary")) + summary_update_script(totals, meta)
+                yield to_xml(
+                    H3("⚙️ DMARC-Konfiguration", style="margin: 30px 0 10px 0;")
+                ) + to_xml(create_policy_info(meta))
+                continue
+
+            classification = classify_record(item)
+            totals[classification][0] += 1
+            totals[classification][1] += item["count"]
+            if classification == "error" and len(error_records) < MAX_TABLE_ROWS:
+                error_records.append(item)
+            rows.append(to_xml(create_record_row(item)))
+
+            if len(rows) >= batch_size:
+                if not table_open:
+                    rows.insert(0, records_table_start())
+                    table_open = True
+                yield "".join(rows) + summary_update_script(totals, meta)
+                rows = []
+    except ET.ParseError as e:
+        error = f"Fehler beim Parsen der XML: {e}"
+    except ValueError as e:
+        error = str(e)
+    else:
+        error = None
+
+    if error:
+        yield ("</tbody></table>" if table_open else "") + to_xml(
+            create_parse_errors([error])
         )
+        yield "</main></body></html>"
+        return
+
+    if rows and not table_open:
+        rows.insert(0, records_table_start())
+        table_open = True
+    yield "".join(rows) + ("</tbody></table>" if table_open else "")
+    yield summary_update_script(totals, meta)
+    if error_records:
+        yield to_xml(create_error_details(error_records, totals["error"][0]))
+    yield "</main></body></html>"
 
-    return Div(*content, id="result", style="animation: fadeIn 0.5s ease-in;")
+
+@rt("/analyze/stream", methods=["POST"])
+async def analyze_dmarc_stream(dmarcxml: UploadFile):
+    """Analyze uploaded DMARC XML file, streaming results while parsing"""
+    if not dmarcxml.filename:
+        return Div(
+            "❌ Keine Datei ausgewählt",
+            style="color: #dc3545; font-weight: bold; padding: 20px; background: #f8d7da; border-radius: 4px;",
+        )
+
+    return StreamingResponse(
+        stream_dmarc_report(dmarcxml.file), media_type="text/html; charset=utf-8"
+    )
 
 
 @rt("/style.css")
@@ -0,0 +1,289 @@
+"""What-if simulation of DMARC policies over aggregate reports.
+
+Re-evaluates every record of one or more reports under candidate policies and
+projects how many messages each source would get rejected or quarantined:
+
+    python simulate.py reports/*.xml --policy "p=quarantine; pct=25"
+    python simulate.py reports/*.xml --policy p=reject,adkim=s --top 20
+    python simulate.py reports/*.xml --sweep --json > sweep.json
+
+Records are loaded once into column arrays. Per DKIM/SPF alignment mode the
+failing messages are summed per source in a single vectorized pass, after which
+each candidate policy only costs a few operations per source, so large sweeps
+over millions of records stay interactive.
+"""
+
+import argparse
+import itertools
+import json
+import re
+import sys
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from main import iter_dmarc_xml
+
+POLICIES = ("none", "quarantine", "reject")
+ALIGNMENTS = ("r", "s")
+
+# Public suffixes with more than one label, enough for the usual senders.
+# Without the full public suffix list relaxed alignment is an approximation.
+MULTI_LABEL_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "me.uk",
+    "com.au", "net.au", "org.au", "co.nz", "co.jp", "ne.jp", "or.jp",
+    "co.at", "or.at", "gv.at", "com.br", "com.cn", "co.za", "com.tr", "co.in",
+}  # fmt: skip
+
+
+def organizational_domain(domain):
+    """Approximate organizational domain used for relaxed alignment"""
+    labels = domain.lower().rstrip(".").split(".")
+    if len(labels) > 2 and ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def aligned_pass(results, header_from, strict):
+    """Whether any passing auth result is aligned with header_from"""
+    for domain, result in results:
+        if result != "pass" or not domain:
+            continue
+        domain = domain.lower().rstrip(".")
+        if domain == header_from or (
+            not strict
+            and organizational_domain(domain) == organizational_domain(header_from)
+        ):
+            return True
+    return False
+
+
+def load_reports(paths):
+    """Load the records of all reports into column arrays"""
+    sources = {}
+    columns = {
+        name: []
+        for name in (
+            "source",
+            "count",
+            "subdomain",
+            "dkim_r",
+            "dkim_s",
+            "spf_r",
+            "spf_s",
+        )
+    }
+
+    for path in paths:
+        try:
+            # Local files are trusted, so no size or time caps apply
+            with open(path, "rb") as f:
+                domain = ""
+                for kind, item in iter_dmarc_xml(f, limits=None):
+                    if kind == "meta":
+                        domain = item["domain"].lower().rstrip(".")
+                        continue
+
+                    header_from = (item["header_from"] or domain).lower().rstrip(".")
+                    columns["source"].append(
+                        sources.setdefault(item["ip"], len(sources))
+                    )
+                    columns["count"].append(item["count"])
+                    columns["subdomain"].append(header_from != domain)
+
+                    # Without auth_results only the reporter's verdict is available
+                    for mech in ("dkim", "spf"):
+                        results = item[f"{mech}_results"]
+                        if results:
+                            relaxed = aligned_pass(results, header_from, strict=False)
+                            strict = aligned_pass(results, header_from, strict=True)
+                        else:
+                            relaxed = strict = item[mech] == "pass"
+                        columns[f"{mech}_r"].append(relaxed)
+                        columns[f"{mech}_s"].append(strict)
+        except (OSError, ValueError, ET.ParseError) as e:
+            raise ValueError(f"{path}: {e}") from e
+
+    data = {
+        name: np.array(values, dtype=np.int64 if name == "count" else None)
+        for name, values in columns.items()
+    }
+    data["source"] = data["source"].astype(np.int32)
+    for name in ("subdomain", "dkim_r", "dkim_s", "spf_r", "spf_s"):
+        data[name] = data[name].astype(bool)
+    data["sources"] = np.array(list(sources), dtype=object)
+    return data
+
+
+def parse_policy(text):
+    """Parse "p=reject; sp=none; pct=50; adkim=s; aspf=r" (',' works too)"""
+    policy = {}
+    for part in re.split(r"[;,]", text):
+        if not part.strip():
+            continue
+        key, _, value = part.partition("=")
+        policy[key.strip().lower()] = value.strip().lower()
+    policy.pop("v", None)
+
+    p = policy.get("p", "none")
+    result = {
+        "p": p,
+        "sp": policy.get("sp", p),
+        "pct": int(policy.get("pct", 100)),
+        "adkim": policy.get("adkim", "r"),
+        "aspf": policy.get("aspf", "r"),
+    }
+    if result["p"] not in POLICIES or result["sp"] not in POLICIES:
+        raise ValueError(f"p/sp must be one of {', '.join(POLICIES)}: {text!r}")
+    if result["adkim"] not in ALIGNMENTS or result["aspf"] not in ALIGNMENTS:
+        raise ValueError(f"adkim/aspf must be 'r' or 's': {text!r}")
+    if not 0 <= result["pct"] <= 100:
+        raise ValueError(f"pct must be between 0 and 100: {text!r}")
+    return result
+
+
+def format_policy(policy):
+    return "; ".join(
+        f"{key}={policy[key]}" for key in ("p", "sp", "pct", "adkim", "aspf")
+    )
+
+
+def failing_by_source(data, adkim, aspf):
+    """Failing messages per source for the organizational domain and subdomains"""
+    aligned = data[f"dkim_{adkim}"] | data[f"spf_{aspf}"]
+    failing = np.where(aligned, 0, data["count"])
+    n = len(data["sources"])
+    subdomain = data["subdomain"]
+    return (
+        np.bincount(data["source"][~subdomain], failing[~subdomain], minlength=n),
+        np.bincount(data["source"][subdomain], failing[subdomain], minlength=n),
+    )
+
+
+def sweep(data, policies):
+    """Simulate each policy, returning per-source projections"""
+    total = np.bincount(data["source"], data["count"], minlength=len(data["sources"]))
+    failing = {}
+    results = []
+
+    for policy in policies:
+        key = (policy["adkim"], policy["aspf"])
+        if key not in failing:
+            failing[key] = failing_by_source(data, *key)
+        domain_failing, sub_failing = failing[key]
+
+        # pct applies the policy to a sample; the rest gets the next lower one
+        sampled = policy["pct"] / 100
+        rejected = np.zeros_like(total, dtype=float)
+        quarantined = np.zeros_like(total, dtype=float)
+        for failing_messages, action in (
+            (domain_failing, policy["p"]),
+            (sub_failing, policy["sp"]),
+        ):
+            if action == "reject":
+                rejected += failing_messages * sampled
+                quarantined += failing_messages * (1 - sampled)
+            elif action == "quarantine":
+                quarantined += failing_messages * sampled
+
+        results.append(
+            {
+                "policy": policy,
+                "messages": int(total.sum()),
+                "rejected": float(rejected.sum()),
+                "quarantined": float(quarantined.sum()),
+                "per_source": (total, rejected, quarantined),
+            }
+        )
+    return results
+
+
+def simulate(data, policy):
+    """Simulate a single policy"""
+    return sweep(data, [policy])[0]
+
+
+def top_sources(data, result, limit):
+    """Sources with the most affected messages, as dicts"""
+    total, rejected, quarantined = result["per_source"]
+    affected = rejected + quarantined
+    order = np.argsort(-affected, kind="stable")[:limit]
+    return [
+        {
+            "ip": data["sources"][i],
+            "messages": int(total[i]),
+            "rejected": round(float(rejected[i]), 1),
+            "quarantined": round(float(quarantined[i]), 1),
+        }
+        for i in order
+        if affected[i] > 0
+    ]
+
+
+def sweep_policies():
+    """All combinations of p, sp, adkim, aspf and a few pct steps"""
+    return [
+        {"p": p, "sp": sp, "pct": pct, "adkim": adkim, "aspf": aspf}
+        for p, sp, pct, adkim, aspf in itertools.product(
+            POLICIES, POLICIES, (10, 25, 50, 100), ALIGNMENTS, ALIGNMENTS
+        )
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("reports", nargs="+", help="DMARC XML reports (.gz, .zip ok)")
+    parser.add_argument(
+        "--policy", action="append", default=[], help='e.g. "p=reject; pct=50"'
+    )
+    parser.add_argument("--sweep", action="store_true", help="Simulate all policies")
+    parser.add_argument("--top", type=int, default=10, help="Sources shown per policy")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        policies = [parse_policy(text) for text in args.policy]
+    except ValueError as e:
+        parser.error(str(e))
+    if args.sweep:
+        policies += sweep_policies()
+    if not policies:
+        parser.error("give at least one --policy or --sweep")
+
+    try:
+        data = load_reports(args.reports)
+    except ValueError as e:
+        parser.error(str(e))
+    results = sweep(data, policies)
+
+    if args.json:
+        output = [
+            {
+                "policy": result["policy"],
+                "messages": result["messages"],
+                "rejected": round(result["rejected"], 1),
+                "quarantined": round(result["quarantined"], 1),
+                "sources": top_sources(data, result, args.top),
+            }
+            for result in results
+        ]
+        json.dump(output, sys.stdout, indent=2)
+        print()
+        return
+
+    print(f"{len(data['count'])} Einträge von {len(data['sources'])} Quellen")
+    for result in results:
+        print(
+            f"\n{format_policy(result['policy'])}: "
+            f"{result['rejected']:.0f} abgelehnt, {result['quarantined']:.0f} in Quarantäne "
+            f"von {result['messages']} Nachrichten"
+        )
+        for source in top_sources(data, result, args.top):
+            print(
+                f"  {source['ip']:<40} {source['rejected']:>10.0f} abgelehnt "
+                f"{source['quarantined']:>10.0f} Quarantäne  von {source['messages']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""Load-test harness for the privacy and DMARC analyzers.
+
+Drives the privacy `/` route and the DMARC `/analyze` route with configurable
+concurrency, either in-process through ASGI or against a running server, and
+reports throughput, latency percentiles and RSS over time. After a warm-up the
+load is applied for several runs and the median of each metric is reported,
+which keeps baseline comparisons from tripping over a single noisy run:
+
+    python loadtest.py                                  # both apps, in-process
+    python loadtest.py dmarc -c 32 -d 20 --records 500
+    python loadtest.py privacy --url http://127.0.0.1:5001 --pid 4242
+    python loadtest.py --save-baseline baseline.json
+    python loadtest.py --baseline baseline.json --tolerance 0.15
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).parent
+
+USER_AGENTS = [
+    # (weight, user agent) - roughly a desktop/mobile browser mix plus bots
+    (
+        40,
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36",
+    ),
+    (
+        15,
+        "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1",
+    ),
+    (12, "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0"),
+    (
+        10,
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36 Edg/126.0.2592.87",
+    ),
+    (
+        10,
+        "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.6478.71 Mobile Safari/537.36",
+    ),
+    (
+        5,
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15",
+    ),
+    (4, "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)"),
+    (2, "curl/8.8.0"),
+    (2, ""),
+]
+
+LANGUAGES = [
+    (45, "de-DE,de;q=0.9,en-US;q=0.8,en;q=0.7"),
+    (25, "de-DE"),
+    (15, "en-US,en;q=0.9"),
+    (10, ""),
+    (5, "de-CH,de;q=0.9,fr-CH;q=0.8,fr;q=0.7,en;q=0.6,it;q=0.5"),
+]
+
+CLIENT_IPS = ["203.0.113.7", "198.51.100.23", "192.168.1.10", "127.0.0.1"]
+
+
+def pick(weighted):
+    """Pick a value from a list of (weight, value) pairs"""
+    return random.choices([v for _, v in weighted], [w for w, _ in weighted])[0]
+
+
+def make_dmarc_report(records):
+    """Generate a plausible aggregate DMARC report with `records` rows"""
+    begin = int(time.time()) - 86400
+    rows = []
+    for i in range(records):
+        spf, dkim = random.choice(
+            [("pass", "pass")] * 6
+            + [("pass", "fail"), ("fail", "pass"), ("fail", "fail")]
+        )
+        disp = (
+            "none" if "pass" in (spf, dkim) else random.choice(["none", "quarantine"])
+        )
+        rows.append(
+            f"<record><row><source_ip>198.51.{i // 250 % 250}.{i % 250}</source_ip>"
+            f"<count>{random.randint(1, 500)}</count><policy_evaluated>"
+            f"<disposition>{disp}</disposition><dkim>{dkim}</dkim><spf>{spf}</spf>"
+            f"</policy_evaluated></row><identifiers><header_from>example.com</header_from>"
+            f"</identifiers><auth_results><dkim><domain>example.com</domain>"
+            f"<result>{dkim}</result></dkim><spf><domain>example.com</domain>"
+            f"<result>{spf}</result></spf></auth_results></record>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><feedback><report_metadata>'
+        "<org_name>loadtest</org_name><email>noreply@example.net</email>"
+        f"<report_id>{random.getrandbits(32)}</report_id><date_range><begin>{begin}</begin>"
+        f"<end>{begin + 86400}</end></date_range></report_metadata><policy_published>"
+        "<domain>example.com</domain><adkim>r</adkim><aspf>r</aspf><p>none</p>"
+        f"<sp>none</sp><pct>100</pct></policy_published>{''.join(rows)}</feedback>"
+    ).encode()
+
+
+def privacy_request(_):
+    headers = {"user-agent": pick(USER_AGENTS), "accept-language": pick(LANGUAGES)}
+    if random.random() < 0.3:
+        headers["cookie"] = "session=x"
+    return {"method": "GET", "url": "/", "headers": headers}
+
+
+def dmarc_request(reports):
+    return {
+        "method": "POST",
+        "url": "/analyze",
+        "files": {"dmarcxml": ("report.xml", random.choice(reports), "text/xml")},
+    }
+
+
+TARGETS = {
+    "privacy": ("privacy-analyzer", privacy_request),
+    "dmarc": ("dmarc-analyzer", dmarc_request),
+}
+
+
+def load_app(name):
+    """Import an app's main.py under a unique module name and return its ASGI app"""
+    app_dir = ROOT / TARGETS[name][0]
+    sys.path.insert(0, str(app_dir))
+    try:
+        spec = importlib.util.spec_from_file_location(
+            f"{name}_main", app_dir / "main.py"
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(str(app_dir))
+    return module.app
+
+
+def rss_mb(pid=None):
+    """Current RSS of `pid` (default: this process) in MB"""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # No procfs (macOS): fall back to peak RSS of this process
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss / 2**20 if sys.platform == "darwin" else maxrss / 2**10
+
+
+def percentiles(latencies):
+    """p50/p95/p99/max of a list of latencies in seconds, as milliseconds"""
+    if len(latencies) < 2:
+        value = latencies[0] * 1000 if latencies else 0.0
+        return {"p50": value, "p95": value, "p99": value, "max": value}
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "p50": cuts[49] * 1000,
+        "p95": cuts[94] * 1000,
+        "p99": cuts[98] * 1000,
+        "max": max(latencies) * 1000,
+    }
+
+
+async def run_target(name, args):
+    """Run the load test for one target and return its result dict"""
+    make_request = TARGETS[name][1]
+    reports = None
+    if name == "dmarc":
+        reports = [
+            make_dmarc_report(max(1, int(random.gauss(args.records, args.records / 3))))
+            for _ in range(8)
+        ]
+
+    if args.url:
+        clients = [httpx.AsyncClient(base_url=args.url, timeout=args.timeout)]
+    else:
+        app = load_app(name)
+        clients = [
+            httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app, client=(ip, 50000)),
+                base_url="http://testserver",
+                timeout=args.timeout,
+            )
+            for ip in CLIENT_IPS
+        ]
+
+    async def measure(duration):
+        """Apply load for duration seconds, return (latencies, errors, rss, elapsed)"""
+        latencies = []
+        errors = 0
+        rss = []
+        started = time.perf_counter()
+        deadline = started + duration
+        stop = threading.Event()
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                client = random.choice(clients)
+                request = make_request(reports)
+                t0 = time.perf_counter()
+                try:
+                    response = await client.request(**request)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                latencies.append(time.perf_counter() - t0)
+                errors += failed
+
+        def sample_rss():
+            # A thread, so handlers blocking the event loop don't stop sampling
+            while True:
+                rss.append(
+                    (
+                        round(time.perf_counter() - started, 2),
+                        round(rss_mb(args.pid), 1),
+                    )
+                )
+                if stop.wait(args.sample_interval):
+                    return
+
+        sampler = threading.Thread(target=sample_rss, daemon=True)
+        sampler.start()
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+        stop.set()
+        sampler.join()
+        rss.append(
+            (round(time.perf_counter() - started, 2), round(rss_mb(args.pid), 1))
+        )
+        return latencies, errors, rss, time.perf_counter() - started
+
+    if args.warmup:
+        await measure(args.warmup)
+
+    runs = []
+    for _ in range(args.runs):
+        latencies, errors, rss, elapsed = await measure(args.duration)
+        runs.append(
+            {
+                "requests": len(latencies),
+                "errors": errors,
+                "concurrency": args.concurrency,
+                "rps": len(latencies) / elapsed,
+                **percentiles(latencies),
+                "rss_peak_mb": max(mb for _, mb in rss),
+                "rss": rss,
+            }
+        )
+
+    for client in clients:
+        await client.aclose()
+
+    # Median of each metric across runs, so one noisy run doesn't count but a
+    # slowdown in most runs does; errors are not noise, so those of all runs
+    # count. The RSS timeline is the one of the run with the median rps.
+    median_run = sorted(runs, key=lambda run: run["rps"])[len(runs) // 2]
+    return {
+        "requests": round(statistics.median(run["requests"] for run in runs)),
+        "errors": sum(run["errors"] for run in runs),
+        "concurrency": args.concurrency,
+        **{
+            key: statistics.median(run[key] for run in runs)
+            for key in ("rps", "p50", "p95", "p99", "max", "rss_peak_mb")
+        },
+        "rss": median_run["rss"],
+        "runs": len(runs),
+        "runs_rps": [round(run["rps"], 1) for run in runs],
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages against a saved baseline"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: rps {result['rps']:.1f} < baseline {base['rps']:.1f}"
+            )
+        for key in ("p50", "p95", "p99"):
+            if result[key] > base[key] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {key} {result[key]:.1f}ms > baseline {base[key]:.1f}ms"
+                )
+        # Errors are summed over all runs, so compare them per run
+        errors = result["errors"] / result.get("runs", 1)
+        base_errors = base["errors"] / base.get("runs", 1)
+        if errors > base_errors:
+            regressions.append(
+                f"{name}: errors per run {errors:g} > baseline {base_errors:g}"
+            )
+    return regressions
+
+
+def print_result(name, result):
+    print(
+        f"{name:8} {result['requests']:>7} req  {result['errors']:>4} err  "
+        f"{result['rps']:>8.1f} req/s  p50 {result['p50']:>7.1f}ms  "
+        f"p95 {result['p95']:>7.1f}ms  p99 {result['p99']:>7.1f}ms  "
+        f"RSS peak {result['rss_peak_mb']:.1f}MB"
+    )
+    if len(result["runs_rps"]) > 1:
+        print(
+            "         req/s per run: "
+            + "  ".join(f"{rps:.1f}" for rps in result["runs_rps"])
+        )
+    print("         RSS: " + "  ".join(f"{t}s={mb}MB" for t, mb in result["rss"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "targets", nargs="*", help=f"Apps to test: {', '.join(TARGETS)}"
+    )
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument(
+        "-d", "--duration", type=float, default=10.0, help="Seconds per run"
+    )
+    parser.add_argument(
+        "--warmup", type=float, default=3.0, help="Unmeasured seconds before the runs"
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=3,
+        help="Measured runs, the median of each metric is reported",
+    )
+    parser.add_argument(
+        "--records", type=int, default=200, help="Mean records per DMARC report"
+    )
+    parser.add_argument("--url", help="Test a running server instead of in-process")
+    parser.add_argument("--pid", type=int, help="Sample RSS of this server process")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--save-baseline", metavar="FILE")
+    parser.add_argument(
+        "--baseline", metavar="FILE", help="Fail on regressions vs FILE"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    targets = args.targets or list(TARGETS)
+    if unknown := set(targets) - set(TARGETS):
+        parser.error(f"unknown target(s): {', '.join(sorted(unknown))}")
+    if args.runs < 1:
+        parser.error("--runs must be at least 1")
+    if args.url and len(targets) != 1:
+        parser.error("--url needs exactly one target")
+
+    random.seed(args.seed)
+    results = {name: asyncio.run(run_target(name, args)) for name in targets}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, result in results.items():
+            print_result(name, result)
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        regressions = compare(
+            results, json.loads(Path(args.baseline).read_text()), args.tolerance
+        )
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Batch privacy audit over web server access logs.
+
+Streams combined-format or JSON-lines access logs (plain or gzipped) through
+the same checks the web app runs per request and prints aggregated issue
+counts and recommendation distributions:
+
+    python audit.py /var/log/nginx/access.log*.gz
+    python audit.py --json --workers 8 access.log > report.json
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from main import evaluate_rules
+
+# %h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-agent}i"
+COMBINED_LOG = re.compile(
+    r"^(?P<ip>\S+) \S+ \S+ \[[^\]]*\] "
+    r'"(?:[^"\\]|\\.)*" \d{3} \S+'
+    r'(?: "(?:[^"\\]|\\.)*" "(?P<ua>(?:[^"\\]|\\.)*)")?'
+)
+
+# Field names used by common JSON log formats (nginx escape=json, Caddy, ...)
+JSON_FIELDS = {
+    "ip": ("remote_addr", "client_ip", "ip", "remote_ip"),
+    "ua": ("http_user_agent", "user_agent", "ua"),
+    "lang": ("http_accept_language", "accept_language", "lang"),
+    "cookies": ("http_cookie", "cookie", "cookies"),
+}
+
+
+def open_log(path):
+    """Open a log file as text, transparently decompressing gzip"""
+    if path == "-":
+        return sys.stdin
+    with open(path, "rb") as f:
+        gzipped = f.read(2) == b"\x1f\x8b"
+    opener = gzip.open if gzipped else open
+    return opener(path, "rt", encoding="utf-8", errors="replace")
+
+
+def read_lines(paths):
+    """Yield raw log lines from all files, one file open at a time"""
+    for path in paths:
+        f = open_log(path)
+        try:
+            yield from f
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def chunked(lines, size):
+    """Group an iterable of lines into lists of at most `size` lines"""
+    it = iter(lines)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def _json_field(entry, name):
+    for key in JSON_FIELDS[name]:
+        if entry.get(key):
+            return entry[key]
+    return ""
+
+
+def parse_line(line):
+    """Parse a log line into (ip, ua, lang, has_cookies) or None"""
+    line = line.strip()
+    if not line:
+        return None
+
+    if line.startswith("{"):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(entry, dict):
+            return None
+        # Caddy nests request data, nginx/traefik usually don't
+        request = entry.get("request")
+        if isinstance(request, dict):
+            headers = request.get("headers") or {}
+            entry = {
+                "ip": request.get("remote_ip") or request.get("client_ip"),
+                "ua": " ".join(headers.get("User-Agent") or []),
+                "lang": " ".join(headers.get("Accept-Language") or []),
+                "cookies": bool(headers.get("Cookie")),
+                **entry,
+            }
+        return (
+            str(_json_field(entry, "ip")),
+            str(_json_field(entry, "ua")),
+            str(_json_field(entry, "lang")),
+            bool(_json_field(entry, "cookies")),
+        )
+
+    m = COMBINED_LOG.match(line)
+    if not m:
+        return None
+    ua = (m.group("ua") or "").replace('\\"', '"')
+    if ua == "-":
+        ua = ""
+    # Combined format logs neither Accept-Language nor cookies
+    return m.group("ip"), ua, "", False
+
+
+def analyze_chunk(lines):
+    """Parse and analyze a chunk of log lines, returning partial counters"""
+    issues = Counter()
+    recommendations = Counter()
+    parsed = skipped = 0
+
+    for line in lines:
+        fields = parse_line(line)
+        if fields is None:
+            skipped += 1
+            continue
+        ip, ua, lang, has_cookies = fields
+        parsed += 1
+
+        findings = evaluate_rules(ua, ip, lang, has_cookies)
+        issues.update(findings["ua"])
+        issues.update(findings["lang"])
+        issues.update(findings["ip"])
+        recommendations.update(
+            (name, recommended) for name, _, recommended in findings["recommendations"]
+        )
+
+    return issues, recommendations, parsed, skipped
+
+
+def run_chunks(chunks, workers):
+    """Yield analyzed chunk results, keeping at most 2 chunks per worker in flight"""
+    if workers <= 1:
+        yield from map(analyze_chunk, chunks)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(analyze_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def audit(paths, workers=None, chunk_size=5000):
+    """Run the privacy checks over access logs and aggregate the results"""
+    workers = workers or os.cpu_count() or 1
+    issues = Counter()
+    recommendations = Counter()
+    parsed = skipped = 0
+
+    for c_issues, c_recs, c_parsed, c_skipped in run_chunks(
+        chunked(read_lines(paths), chunk_size), workers
+    ):
+        issues.update(c_issues)
+        recommendations.update(c_recs)
+        parsed += c_parsed
+        skipped += c_skipped
+
+    severities = Counter()
+    for (severity, _), count in issues.items():
+        severities[severity] += count
+
+    return {
+        "requests": parsed,
+        "skipped": skipped,
+        "issues": [
+            {"severity": severity, "text": text, "count": count}
+            for (severity, text), count in issues.most_common()
+        ],
+        "severities": dict(severities),
+        "recommendations": [
+            {
+                "name": name,
+                "recommended": recommended,
+                "count": count,
+                "share": count / parsed if parsed else 0.0,
+            }
+            for (name, recommended), count in recommendations.most_common()
+        ],
+    }
+
+
+def print_report(report, out=sys.stdout):
+    """Print an audit report as plain text"""
+    total = report["requests"]
+    print(f"Requests analysiert: {total} (übersprungen: {report['skipped']})", file=out)
+
+    print("\nBefunde:", file=out)
+    for issue in report["issues"]:
+        share = issue["count"] / total if total else 0.0
+        print(
+            f"  {issue['count']:>10} {share:>7.1%}  [{issue['severity']}] {issue['text']}",
+            file=out,
+        )
+
+    print("\nEmpfehlungen:", file=out)
+    for rec in report["recommendations"]:
+        mark = "*" if rec["recommended"] else " "
+        print(
+            f"  {rec['count']:>10} {rec['share']:>7.1%} {mark} {rec['name']}", file=out
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("logs", nargs="+", help="Log files (.gz ok), '-' for stdin")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Lines per task")
+    parser.add_argument("--json", action="store_true", help="Print report as JSON")
+    args = parser.parse_args(argv)
+
+    report = audit(args.logs, workers=args.workers, chunk_size=args.chunk_size)
+    if args.json:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 from fasthtml.common import *
+from functools import lru_cache
 import re
 import datetime
 import json
+import os
+from pathlib import Path
 
+from rules import RuleFile
 
 LINKS = {
     "uBlock Origin (Firefox)": "https://addons.mozilla.org/de/firefox/addon/ublock-origin/",
@@ -80,144 +84,64 @@ def is_common_user_agent(ua):
     return True
 
 
-def analyze_user_agent(ua):
-    """Analyze user agent for privacy concerns"""
-    issues = []
+PREDICATES = {
+    "no_ua": lambda r: not r["ua"],
+    "chrome": lambda r: "Chrome" in r["ua"] and "Firefox" not in r["ua"],
+    "edge": lambda r: "Edge" in r["ua"],
+    "uncommon_ua": lambda r: not is_common_user_agent(r["ua"]),
+    "detailed_versions": lambda r: len(re.findall(r"/[\d.]+", r["ua"])) > 4,
+    "no_lang": lambda r: not r["lang"],
+    "many_languages": lambda r: len(r["lang"].split(",")) > 3,
+    "weighted_languages": lambda r: ";q=" in r["lang"],
+    "local_ip": lambda r: (
+        not r["ip"] or r["ip"] == "127.0.0.1" or r["ip"].startswith("192.168.")
+    ),
+    "lan_ip": lambda r: r["ip"] == "127.0.0.1" or r["ip"].startswith("192.168."),
+    "relay_ip": lambda r: "relay" in r["ip"].lower(),
+    "cookies": lambda r: r["has_cookies"],
+}
 
-    if not ua:
-        issues.append(
-            PrivacyIssue("Kein User-Agent gefunden - sehr ungewöhnlich", "high")
-        )
-        return issues
+# Page sections rules can add to, all of them are always present in findings
+SECTIONS = ("ua", "ip", "lang", "tz", "cookies", "critical", "recommendations")
 
-    # Check for common browsers and versions
-    if "Chrome" in ua and "Firefox" not in ua:
-        issues.append(PrivacyIssue("Chrome sammelt viele Nutzerdaten", "warning"))
+RULES = RuleFile(
+    os.environ.get("PRIVACY_RULES", Path(__file__).parent / "rules.json"),
+    PREDICATES,
+    SECTIONS,
+)
 
-    if "Edge" in ua:
-        issues.append(
-            PrivacyIssue("Microsoft Edge teilt Daten mit Microsoft", "warning")
-        )
 
-    # Check if it's a common user agent
-    if not is_common_user_agent(ua):
-        issues.append(
-            PrivacyIssue(
-                "Ungewöhnlicher User-Agent erhöht Fingerprinting-Risiko", "high"
-            )
-        )
+def evaluate_rules(ua="", ip="", lang="", has_cookies=False):
+    """Evaluate the privacy rules for a request, returning outcomes per section"""
+    return RULES.current().evaluate(
+        ua=ua or "", ip=ip or "", lang=lang or "", has_cookies=bool(has_cookies)
+    )
 
-    # Check for detailed version info (fingerprinting risk)
-    version_matches = re.findall(r"/[\d.]+", ua)
-    if len(version_matches) > 4:
-        issues.append(
-            PrivacyIssue("Sehr detaillierte Versionsinformationen", "warning")
-        )
 
-    return issues
+def issues_for(findings):
+    """Turn (severity, message) rule outcomes into PrivacyIssue elements"""
+    return [PrivacyIssue(message, severity) for severity, message in findings]
 
 
-def analyze_language(lang):
-    """Analyze language headers for privacy concerns"""
-    issues = []
-
-    if not lang:
-        return [PrivacyIssue("Keine Sprachpräferenz - gut für Privatsphäre", "good")]
-
-    # Count languages - more languages = more fingerprinting potential
-    languages = lang.split(",")
-    if len(languages) > 3:
-        issues.append(
-            PrivacyIssue("Viele Sprachen erhöhen Fingerprinting-Risiko", "warning")
-        )
+def analyze_user_agent(ua):
+    """Analyze user agent for privacy concerns"""
+    return issues_for(evaluate_rules(ua=ua)["ua"])
 
-    # Check for very specific locale info
-    if any(";q=" in l for l in languages):
-        issues.append(PrivacyIssue("Detaillierte Sprachgewichtung sichtbar", "warning"))
 
-    return issues
+def analyze_language(lang):
+    """Analyze language headers for privacy concerns"""
+    return issues_for(evaluate_rules(lang=lang)["lang"])
 
 
 def analyze_ip(ip):
     """Analyze IP for privacy concerns"""
-    issues = []
-
-    if not ip or ip == "127.0.0.1" or ip.startswith("192.168."):
-        issues.append(PrivacyIssue("Lokale IP-Adresse", "good"))
-    else:
-        issues.append(
-            PrivacyIssue("Öffentliche IP sichtbar - nutzen Sie VPN/Proxy", "warning")
-        )
-        issues.append(
-            PrivacyIssue("Wenn Sie bereits VPN/Proxy nutzen: ✅ Gut!", "good")
-        )
-
-    return issues
+    return issues_for(evaluate_rules(ip=ip)["ip"])
 
 
 def get_recommendations(ua, ip, lang, has_cookies):
     """Get personalized recommendations based on analysis"""
-    recommendations = []
-
-    # Basic privacy recommendations
-    recommendations.append(
-        (
-            "uBlock Origin",
-            ["uBlock Origin (Firefox)", "uBlock Origin (Chrome)"],
-            True,
-        )
-    )
-
-    recommendations.append(
-        (
-            "Privacy Badger",
-            ["Privacy Badger (Firefox)", "Privacy Badger (Chrome)"],
-            True,
-        )
-    )
-
-    # Chrome-specific recommendations
-    if "Chrome" in ua and "Firefox" not in ua:
-        recommendations.append(
-            (
-                "Ghostery (Alternative)",
-                ["Ghostery (Firefox)", "Ghostery (Chrome)"],
-                True,
-            )
-        )
-
-    # Cookie recommendations
-    if has_cookies:
-        recommendations.append(
-            (
-                "Cookie AutoDelete",
-                ["Cookie AutoDelete (Firefox)", "Cookie AutoDelete (Chrome)"],
-                True,
-            )
-        )
-
-    # User agent recommendations
-    if not is_common_user_agent(ua):
-        recommendations.append(
-            (
-                "User-Agent Switcher (für gängige UA)",
-                ["User-Agent Switcher (Firefox)", "User-Agent Switcher (Chrome)"],
-                True,
-            )
-        )
-    else:
-        recommendations.append(
-            (
-                "User-Agent Switcher",
-                ["User-Agent Switcher (Firefox)", "User-Agent Switcher (Chrome)"],
-                False,
-            )
-        )
-
-    # Advanced recommendations
-    recommendations.append(("CanvasBlocker", ["CanvasBlocker (Firefox)"], False))
-
-    return recommendations
+    findings = evaluate_rules(ua, ip, lang, has_cookies)["recommendations"]
+    return [(name, list(links), recommended) for name, links, recommended in findings]
 
 
 def get_useragent(req):
@@ -236,6 +160,53 @@ def get_tz():
     return datetime.datetime.now(datetime.timezone.utc).astimezone().tzname()
 
 
+def static_sections():
+    """Page sections that are the same for every visitor"""
+    # Browser-Empfehlungen (ohne Tor)
+    browser_recommendations = Ul(
+        Li(
+            "Datenschutz-fokussiert: ",
+            AddonLink("Firefox", LINKS["Firefox Browser"], True),
+            " (mit Addons konfiguriert)",
+        ),
+        Li("Out-of-the-box Schutz: ", AddonLink("Brave", LINKS["Brave Browser"], True)),
+        Li("Für Experten: Firefox mit strikten Einstellungen"),
+    )
+
+    # Test-Links
+    tests = Ul(
+        Li(AddonLink("EFF Cover Your Tracks", LINKS["EFF Cover Your Tracks"])),
+        Li(AddonLink("AmIUnique", LINKS["AmIUnique"])),
+        Li(AddonLink("Aktuelle User-Agents", LINKS["WhatIsMyBrowser"])),
+    )
+
+    # Alternative Plattformen
+    alternatives = Ul(
+        Li(AddonLink("FMHY - Alternatives to Big Tech", LINKS["FMHY Beginners Guide"])),
+        Li("Open Source Alternativen zu proprietären Services"),
+        Li("Datenschutzfreundliche Suchmaschinen (DuckDuckGo, Startpage)"),
+    )
+
+    return (
+        H2("🌐 Browser-Empfehlung"),
+        browser_recommendations,
+        H2("🧪 Testen Sie Ihre Privatsphäre"),
+        tests,
+        H2("🔄 Alternativen zu Big Tech"),
+        alternatives,
+        Div(
+            "💡 Tipp: Kombinieren Sie mehrere Schutzmaßnahmen für optimale Privatsphäre. Ein VPN/Proxy allein reicht nicht aus.",
+            cls="muted_sm",
+        ),
+    )
+
+
+@lru_cache(maxsize=None)
+def static_sections_html():
+    """Static sections as HTML, rendered once per process"""
+    return NotStr("".join(to_xml(section) for section in static_sections()))
+
+
 # Enhanced CSS
 css = """
 .recommended { 
@@ -294,9 +265,10 @@ def index(req):
     has_cookies = bool(req.cookies)
 
     # Analyse durchführen
-    ua_issues = analyze_user_agent(ua)
-    ip_issues = analyze_ip(ip)
-    lang_issues = analyze_language(lang)
+    findings = evaluate_rules(ua, ip, lang, has_cookies)
+    ua_issues = issues_for(findings["ua"])
+    ip_issues = issues_for(findings["ip"])
+    lang_issues = issues_for(findings["lang"])
 
     # Info-Tabelle mit Analyse
     table = Table(
@@ -304,19 +276,11 @@ def index(req):
         Tbody(
             CheckRow("IP-Adresse", Code(ip), ip_issues),
             CheckRow("Sprache", Code(lang), lang_issues),
-            CheckRow(
-                "Zeitzone",
-                Code(tz),
-                [PrivacyIssue("Zeitzone kann Standort preisgeben", "warning")],
-            ),
+            CheckRow("Zeitzone", Code(tz), issues_for(findings["tz"])),
             CheckRow(
                 "Cookies aktiviert",
                 Code("Ja" if has_cookies else "Nein"),
-                (
-                    [PrivacyIssue("Cookies ermöglichen Tracking", "warning")]
-                    if has_cookies
-                    else []
-                ),
+                issues_for(findings["cookies"]),
             ),
             CheckRow(
                 "Browser / User-Agent",
@@ -328,10 +292,8 @@ def index(req):
     )
 
     # Personalisierte Empfehlungen
-    recommendations = get_recommendations(ua, ip, lang, has_cookies)
-
     addon_list = []
-    for name, link_keys, is_recommended in recommendations:
+    for name, link_keys, is_recommended in findings["recommendations"]:
         links = []
         for key in link_keys:
             if key in LINKS:
@@ -352,42 +314,8 @@ def index(req):
                 )
             )
 
-    # Browser-Empfehlungen (ohne Tor)
-    browser_recommendations = Ul(
-        Li(
-            "Datenschutz-fokussiert: ",
-            AddonLink("Firefox", LINKS["Firefox Browser"], True),
-            " (mit Addons konfiguriert)",
-        ),
-        Li("Out-of-the-box Schutz: ", AddonLink("Brave", LINKS["Brave Browser"], True)),
-        Li("Für Experten: Firefox mit strikten Einstellungen"),
-    )
-
-    # Test-Links
-    tests = Ul(
-        Li(AddonLink("EFF Cover Your Tracks", LINKS["EFF Cover Your Tracks"])),
-        Li(AddonLink("AmIUnique", LINKS["AmIUnique"])),
-        Li(AddonLink("Aktuelle User-Agents", LINKS["WhatIsMyBrowser"])),
-    )
-
-    # Alternative Plattformen
-    alternatives = Ul(
-        Li(AddonLink("FMHY - Alternatives to Big Tech", LINKS["FMHY Beginners Guide"])),
-        Li("Open Source Alternativen zu proprietären Services"),
-        Li("Datenschutzfreundliche Suchmaschinen (DuckDuckGo, Startpage)"),
-    )
-
     # Kritische Warnungen
-    critical_issues = []
-    if (
-        not (ip == "127.0.0.1" or ip.startswith("192.168."))
-        and "relay" not in ip.lower()
-    ):
-        critical_issues.append("Überprüfen Sie, ob Ihr VPN/Proxy korrekt funktioniert!")
-    if "Chrome" in ua and "Firefox" not in ua:
-        critical_issues.append(
-            "Chrome sammelt extensive Nutzerdaten - wechseln Sie zu Firefox oder Brave!"
-        )
+    critical_issues = [message for _, message in findings["critical"]]
 
     critical_section = ""
     if critical_issues:
@@ -405,16 +333,7 @@ def index(req):
         H2("🛡️ Personalisierte Addon-Empfehlungen"),
         P("Grün markierte Addons sind für Ihre Konfiguration besonders empfohlen:"),
         Ul(*addon_list),
-        H2("🌐 Browser-Empfehlung"),
-        browser_recommendations,
-        H2("🧪 Testen Sie Ihre Privatsphäre"),
-        tests,
-        H2("🔄 Alternativen zu Big Tech"),
-        alternatives,
-        Div(
-            "💡 Tipp: Kombinieren Sie mehrere Schutzmaßnahmen für optimale Privatsphäre. Ein VPN/Proxy allein reicht nicht aus.",
-            cls="muted_sm",
-        ),
+        static_sections_html(),
         style="max-width:900px;margin:auto;padding:20px;",
     )
 
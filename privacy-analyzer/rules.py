@@ -0,0 +1,163 @@
+"""Declarative privacy rules compiled into a decision table.
+
+A rule file lists rules like
+
+    {"id": "chrome", "section": "ua", "when": ["chrome", "!no_ua"],
+     "severity": "warning", "message": "Chrome sammelt viele Nutzerdaten"}
+
+or, for recommendations, `"recommend": {"name": ..., "links": [...],
+"recommended": true}` instead of severity and message. `when` names predicates
+(prefixed with `!` to negate) that must all hold. Sections are declared by the
+caller, and every declared section is part of the result, empty if no rule in
+it matched.
+
+On load each predicate used by any rule gets a bit, and each rule becomes a
+pair of masks. Evaluating a request computes every predicate once and looks up
+the resulting bit pattern in a table of precomputed results, so the cost per
+request depends on the number of predicates, not the number of rules.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+SEVERITIES = ("good", "info", "warning", "high")
+
+# The only section holding recommendations instead of findings
+RECOMMENDATIONS = "recommendations"
+
+# Predicate states whose results are cached per rule set
+MAX_TABLE_SIZE = 1 << 16
+
+
+class RuleSet:
+    """Compiled rules, evaluated against a request context"""
+
+    def __init__(self, rules, predicates, sections):
+        used = []
+        compiled = []
+        for rule in rules:
+            if not isinstance(rule, dict):
+                raise ValueError(f"rule {rule!r}: must be an object")
+            require = forbid = 0
+            for name in rule.get("when", []):
+                if not isinstance(name, str):
+                    raise ValueError(f"rule {rule.get('id')}: bad condition {name!r}")
+                negate = name.startswith("!")
+                name = name.lstrip("!")
+                if name not in predicates:
+                    raise ValueError(
+                        f"rule {rule.get('id')}: unknown predicate {name!r}"
+                    )
+                if name not in used:
+                    used.append(name)
+                bit = 1 << used.index(name)
+                if negate:
+                    forbid |= bit
+                else:
+                    require |= bit
+            if require & forbid:
+                raise ValueError(f"rule {rule.get('id')}: contradictory condition")
+            section = rule["section"]
+            if section not in sections:
+                raise ValueError(f"rule {rule.get('id')}: unknown section {section!r}")
+            if ("recommend" in rule) != (section == RECOMMENDATIONS):
+                raise ValueError(
+                    f"rule {rule.get('id')}: only the {RECOMMENDATIONS!r} section "
+                    "holds recommend entries"
+                )
+            compiled.append((require, forbid, section, self._outcome(rule)))
+
+        self.predicates = [(name, predicates[name]) for name in used]
+        self.rules = compiled
+        self.sections = tuple(sections)
+        self.table = {}
+
+    @staticmethod
+    def _outcome(rule):
+        if "recommend" in rule:
+            rec = rule["recommend"]
+            return (rec["name"], tuple(rec["links"]), bool(rec.get("recommended")))
+        if rule.get("severity") not in SEVERITIES:
+            raise ValueError(
+                f"rule {rule.get('id')}: severity must be one of {SEVERITIES}"
+            )
+        return (rule["severity"], rule["message"])
+
+    def state(self, context):
+        """Bit pattern of the predicates that hold for context"""
+        state = 0
+        for bit, (_, predicate) in enumerate(self.predicates):
+            if predicate(context):
+                state |= 1 << bit
+        return state
+
+    def results(self, state):
+        """Outcomes per section for a predicate state"""
+        results = self.table.get(state)
+        if results is None:
+            matched = {section: [] for section in self.sections}
+            for require, forbid, section, outcome in self.rules:
+                if state & require == require and not state & forbid:
+                    matched[section].append(outcome)
+            results = {section: tuple(items) for section, items in matched.items()}
+            if len(self.table) < MAX_TABLE_SIZE:
+                self.table[state] = results
+        return results
+
+    def evaluate(self, **context):
+        """Outcomes per section for a request context"""
+        return self.results(self.state(context))
+
+
+def load_rules(path, predicates, sections):
+    """Load and compile a JSON rule file"""
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    return RuleSet(spec["rules"], predicates, sections)
+
+
+class RuleFile:
+    """A rule file that is recompiled and swapped in when it changes on disk"""
+
+    def __init__(self, path, predicates, sections, check_interval=1.0):
+        self.path = path
+        self.predicates = predicates
+        self.sections = sections
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = os.stat(path).st_mtime_ns
+        self._checked = time.monotonic()
+        self._ruleset = load_rules(path, predicates, sections)
+
+    def current(self):
+        """The current rule set, reloading the file if it has changed"""
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval and self._lock.acquire(
+            blocking=False
+        ):
+            try:
+                self._checked = now
+                self.reload()
+            finally:
+                self._lock.release()
+        return self._ruleset
+
+    def reload(self):
+        """Recompile the rules if the file changed, keeping the old ones on errors"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+
+        try:
+            ruleset = load_rules(self.path, self.predicates, self.sections)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"rules: keeping previous rules, {self.path}: {e}", file=sys.stderr)
+            return
+        self._ruleset = ruleset